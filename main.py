@@ -6,82 +6,182 @@ import numpy as np
 import multiprocessing as mp
 from pathlib import Path
 from datetime import datetime
-
-def sync_processor_worker(slice_queue, o_queue_sync, stop_event, record_enabled, output_directory):
+from shm_ring import SharedFrameRing
+
+# shared memory slot sizes, for the default 1080p color profile (depth is aligned to color)
+ORB_WIDTH, ORB_HEIGHT = 1920, 1080
+# largest Prophesee sensor in use (IMX636, 1280x720), the preview frames are BGR
+EV_MAX_WIDTH, EV_MAX_HEIGHT = 1280, 720
+PC_MAX_POINTS = (ORB_WIDTH * ORB_HEIGHT) // 15 + 1 # preview point budget, same as the former [::15] decimation
+PC_PRESTRIDE = 3 # cheap stride the camera applies before the Z-order filter, keeps it within the frame budget
+PC_FILTER_RADIUS_MM = 10.0 # minimum spacing of the preview points
+# depth range (mm) mapped onto 0-255 for the depth preview, roughly the Femto Bolt NFOV working range
+DEPTH_VIS_NEAR_MM, DEPTH_VIS_FAR_MM = 250, 5500
+
+UI_MAX_DRAIN = 8 # upper bound of stale items a reader skips per wake-up
+SYNC_DRAIN_TIMEOUT_S = 10 # how long quitting waits for pending recordings to be written
+
+def sync_processor_worker(sync_queue, o_ring_sync, stop_event, record_enabled, output_directory):
     from sync_processor import SensorSynchronizer
 
     try:
-        synchronizer = SensorSynchronizer(slice_queue, o_queue_sync, stop_event, record_enabled, output_directory)
+        synchronizer = SensorSynchronizer(sync_queue, o_ring_sync, stop_event, record_enabled, output_directory)
         synchronizer.sync_process()
     except Exception as e:
         print(f"Sync Process Error: {e}")
     finally:
         stop_event.set()
 
-def prophesee_worker(p_queue, slice_queue, stop_event):
+def prophesee_worker(p_ring, sync_queue, stop_event):
     from prophesee import PropheseeCamera
     
     try:
         p_cam = PropheseeCamera()
         print("Prophesee Process: Initialized.")
-        p_cam.start_loop(p_queue, slice_queue, stop_event)
+        p_cam.start_loop(p_ring, sync_queue, stop_event)
     except Exception as e:
         print(f"Prophesee Process Error: {e}")
     finally:
         stop_event.set()
 
-def orbbec_worker(o_queue, o_queue_sync, stop_event):
+def orbbec_worker(o_ring, o_ring_sync, stop_event):
+    import cv2
+    import queue
+    import threading
     from orbbec import OrbbecCamera
+    from pc_filter import morton_filter
+    depth_alpha = 255.0 / (DEPTH_VIS_FAR_MM - DEPTH_VIS_NEAR_MM)
+    depth_beta = -DEPTH_VIS_NEAR_MM * depth_alpha
+
+    # the preview (depth quantization + point cloud filtering) runs in its own thread on the newest frame only,
+    # so a slow preview never holds back the frames going to the sync ring. the numba kernels release the GIL
+    preview_jobs = queue.Queue(maxsize=1)
+    def preview_loop():
+        while True:
+            job = preview_jobs.get()
+            if job is None:
+                break
+            rgb, is_rgb, depth, pc = job
+            try:
+                # the preview only needs 8 bit depth over a fixed range (SIMD scale + saturate)
+                depth_u8 = cv2.convertScaleAbs(depth, alpha=depth_alpha, beta=depth_beta)
+                pc_sub = morton_filter(pc, PC_FILTER_RADIUS_MM, PC_MAX_POINTS) if pc is not None else None
+                # visualization always wants the newest frame, so its ring reclaims the oldest unread slot
+                o_ring.put({'rgb': rgb, 'depth': depth_u8, 'pc': pc_sub}, drop_oldest=True, is_rgb=is_rgb)
+            except Exception as e:
+                print(f"Orbbec Preview Error: {e}")
+    preview_thread = threading.Thread(target=preview_loop, daemon=True)
+    preview_thread.start()
+
     try:
-        o_cam = OrbbecCamera()
+        o_cam = OrbbecCamera(pc_stride=PC_PRESTRIDE)
         print("Orbbec Process: Initialized.")
         
         while not stop_event.is_set():
             rgb, depth, pc, o_c_ts, o_d_ts = o_cam.get_frames()
             
             if rgb is not None:
-                if o_queue.full():
+                # frames are copied straight into shared memory slots, only slot indices are queued.
+                # the sync ring keeps the raw uint16 depth for recording
+                # RGB/BGR color frames come without a byte swap, is_rgb travels along so consumers can handle the order
+                is_rgb = o_cam.color_is_rgb
+                if not o_ring_sync.put({'rgb': rgb, 'depth': depth}, rgb_ts=o_c_ts, depth_ts=o_d_ts, is_rgb=is_rgb):
+                    print("[WARNING!!!] [Orbbec] orbbec sync ring is full. Dropping frame.")
+
+                # replace a preview job that has not been picked up yet
+                try:
+                    preview_jobs.put_nowait((rgb, is_rgb, depth, pc))
+                except queue.Full:
                     try:
-                        p_queue.get_nowait()
-                    except:
+                        preview_jobs.get_nowait()
+                    except queue.Empty:
                         pass
-                if o_queue_sync.full():
-                    print("[WARNING!!!] [Orbbec] orbbec sync queue is full. Dropping frame.")
-                
-                o_queue.put({
-                    'rgb': rgb.copy(),
-                    'depth': depth.copy(),
-                    'pc': pc[::15].copy() if pc is not None else None
-                })
-                o_queue_sync.put({
-                    'rgb': rgb.copy(),
-                    'depth': depth.copy(),
-                    'rgb_ts': o_c_ts,
-                    'depth_ts': o_d_ts
-                })
+                    preview_jobs.put_nowait((rgb, is_rgb, depth, pc))
     except Exception as e:
         print(f"Orbbec Process Error: {e}")
     finally:
+        preview_jobs.put(None)
+        preview_thread.join()
         o_cam.stop()
         print("Orbbec Process: Stopped.")
 
-def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabled, output_directory):
+def run_ui(p_ring, o_ring, o_ring_sync, sync_queue, stop_event, record_enabled, output_directory):
     from PyQt5.QtWidgets import (
         QApplication, QMainWindow, QWidget, 
         QVBoxLayout, QHBoxLayout, QGridLayout, 
         QPushButton
     )
-    from PyQt5.QtCore import QTimer, Qt
-    from PyQt5.QtGui import QFont # Correct module for QFont
+    from PyQt5.QtCore import QThread, pyqtSignal, Qt
+    from PyQt5.QtGui import QFont, QOpenGLWindow # Correct module for QFont
+    from queue import Empty
     import pyqtgraph as pg
     import pyqtgraph.opengl as gl
+    from pyqtgraph.opengl.GLViewWidget import GLViewMixin
     from ui_components import ImageDisplayWidget
+    from pc_filter import filter_and_colorize
     from pprint import pprint
 
-    class PointCloudWidget(gl.GLViewWidget):
+    class ResidentScatterPlotItem(gl.GLScatterPlotItem):
+        """
+        GLScatterPlotItem whose vertex buffers stay allocated on the GPU at max_points capacity.
+        the base class re-allocates a VBO whenever the point count changes, which is every frame here,
+        this one only rewrites the used range (QOpenGLBuffer.write -> glBufferSubData).
+        """
+        def __init__(self, max_points, **kwds):
+            self.max_points = max_points
+            super().__init__(**kwds)
+
+        def upload_vbo(self, vbo, arr):
+            if arr is None:
+                vbo.destroy()
+                return
+            if not vbo.isCreated():
+                vbo.create()
+            vbo.bind()
+            if vbo.size() < arr.nbytes:
+                point_nbytes = arr.nbytes // max(len(arr), 1)
+                vbo.allocate(max(self.max_points, len(arr)) * point_nbytes)
+            vbo.write(0, arr, arr.nbytes)
+            vbo.release()
+
+    class QueueReader(QThread):
+        """
+        blocks on a queue in its own thread and hands the latest item over to the UI thread through new_item,
+        so the UI thread only wakes up when a frame actually arrives and never renders a backlog.
+
+        :param get_item: getter with the mp.Queue.get(block, timeout) signature raising queue.Empty
+        :param discard: called with every item skipped in favour of a newer one, e.g. to release its ring slot
+        """
+        new_item = pyqtSignal(object)
+
+        def __init__(self, get_item, discard=None):
+            super().__init__()
+            self.get_item = get_item
+            self.discard = discard
+            self.stop_flag = False
+
+        def run(self):
+            while not self.stop_flag:
+                try:
+                    item = self.get_item(True, 0.1)
+                except Empty:
+                    continue
+                # bounded drain, one non-blocking get per item and only Empty ends it
+                for _ in range(UI_MAX_DRAIN):
+                    try:
+                        newer = self.get_item(False)
+                    except Empty:
+                        break
+                    if self.discard is not None:
+                        self.discard(item)
+                    item = newer
+                self.new_item.emit(item)
+
+    class PointCloudWindow(GLViewMixin, QOpenGLWindow):
+        # same GL logic as gl.GLViewWidget, but hosted by a native QOpenGLWindow,
+        # so the 2D panels next to it are not composited through the GPU (see MainWindow)
         def __init__(self):
             super().__init__()
-            self.setMinimumSize(400, 300)
             self.opts['distance'] = 1370
             self.opts['elevation'] = -90
             self.opts['azimuth'] = 270
@@ -95,7 +195,8 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
             self.addItem(grid)      # Add the modified 'grid' object
             # ------------------------------------------
 
-            self.scatter = gl.GLScatterPlotItem(
+            self.scatter = ResidentScatterPlotItem(
+                PC_MAX_POINTS,
                 pos=np.zeros((1, 3)), 
                 color=(0, 1, 0.8, 0.5), 
                 size=2,
@@ -104,6 +205,18 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
             self.addItem(self.scatter)
             self.setCameraPosition(distance=self.opts['distance'])
 
+            # persistent float32 outputs of filter_and_colorize, setData gets views of the first n rows
+            self._pos_buf = np.empty((PC_MAX_POINTS, 3), dtype=np.float32)
+            self._rgba_buf = np.empty((PC_MAX_POINTS, 4), dtype=np.float32)
+            self._rgba_buf[:, 3] = 0.6
+
+            # compile the numba kernel now instead of stalling on the first frame
+            filter_and_colorize(np.zeros((6, 1), dtype=np.float32), self._pos_buf, self._rgba_buf)
+
+        def devicePixelRatioF(self):
+            # GLViewMixin expects the QWidget API, QWindow only has devicePixelRatio()
+            return self.devicePixelRatio()
+
         def mousePressEvent(self, ev):
             self.lastPose = ev.pos()
 
@@ -148,26 +261,16 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
 
         def update_pc(self, pc_data):
             if pc_data is not None and pc_data.size > 0:
-                # check if z coordinate is positive
-                # z coordinate is at index 2
-                mask = pc_data[:, 2] > 0
-                valid_points = pc_data[mask]
-                
-                if valid_points.shape[1] == 6:
-                    # color mode
-                    pos = valid_points[:, :3]
-                    # get color (r, g, b)，nomalized to [0, 1]
-                    colors = valid_points[:, 3:] / 255.0
-                    colors = colors.clip(0, 1) * 0.8
-                    # colors = valid_points[:, 3:]
-                    # add alpha channel
-                    rgba = np.ones((colors.shape[0], 4))
-                    rgba[:, :3] = colors
-                    rgba[:, 3] = 0.6
-                    
-                    self.scatter.setData(pos=pos, color=rgba)
+                if pc_data.shape[0] == 6:
+                    # color mode, the z > 0 check and the color normalization are fused into one pass
+                    n = filter_and_colorize(pc_data, self._pos_buf, self._rgba_buf)
+                    self.scatter.setData(pos=self._pos_buf[:n], color=self._rgba_buf[:n])
                 else:
-                    # no color
+                    # no color, check if z coordinate (index 2) is positive
+                    x, y, z = pc_data
+                    mask = z > 0
+                    # the mask pass reads one contiguous row, only the upload buffer gets interleaved
+                    valid_points = np.stack((x[mask], y[mask], z[mask]), axis=1)
                     self.scatter.setData(pos=valid_points, color=(0, 1, 0.8, 0.8))
 
     class MainWindow(QMainWindow):
@@ -178,6 +281,7 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
 
             self.p_prophesee = None
             self.p_orbbec = None
+            self.p_sync_process = None
             
             central = QWidget()
             self.setCentralWidget(central)
@@ -217,18 +321,25 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
             self.v_ev = ImageDisplayWidget("PROPHESEE EVENT")
             self.v_rgb = ImageDisplayWidget("ORBBEC RGB")
             self.v_depth = ImageDisplayWidget("ORBBEC DEPTH")
-            self.v_pc = PointCloudWidget()
+            self.v_pc = PointCloudWindow()
+            # the GL surface gets its own native window inside the grid
+            self.v_pc_container = QWidget.createWindowContainer(self.v_pc)
+            self.v_pc_container.setMinimumSize(400, 300)
+            self.v_pc_container.setFocusPolicy(Qt.ClickFocus)
             
             grid.addWidget(self.v_ev, 0, 0)
             grid.addWidget(self.v_rgb, 0, 1)
             grid.addWidget(self.v_depth, 1, 0)
-            grid.addWidget(self.v_pc, 1, 1)
+            grid.addWidget(self.v_pc_container, 1, 1)
             layout.addLayout(grid)
 
-            # Polling Timer
-            self.timer = QTimer()
-            self.timer.timeout.connect(self.poll_queue)
-            self.timer.start(10) # ~33 FPS
+            # queue readers, the signals are delivered in the UI thread (queued connection)
+            self.ev_reader = QueueReader(p_ring.get, discard=lambda ring_item: p_ring.release(ring_item[0]))
+            self.ev_reader.new_item.connect(self.on_ev_frame)
+            self.rgbd_reader = QueueReader(o_ring.get, discard=lambda ring_item: o_ring.release(ring_item[0]))
+            self.rgbd_reader.new_item.connect(self.on_rgbd_frame)
+            self.ev_reader.start()
+            self.rgbd_reader.start()
 
         def toggle_sensors(self):
             if self.p_prophesee is None or not self.p_prophesee.is_alive():
@@ -258,13 +369,15 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
                     print(f"Folders created at: {session_path}")
                     output_directory = session_path
 
-                self.p_prophesee = mp.Process(target=prophesee_worker, args=(p_queue, slice_queue, stop_event))
-                self.p_orbbec = mp.Process(target=orbbec_worker, args=(o_queue, o_queue_sync, stop_event))
-                self.p_sync_process = mp.Process(target=sync_processor_worker, args=(slice_queue, o_queue_sync, stop_event, record_enabled, output_directory))
+                self.p_prophesee = mp.Process(target=prophesee_worker, args=(p_ring, sync_queue, stop_event))
+                self.p_orbbec = mp.Process(target=orbbec_worker, args=(o_ring, o_ring_sync, stop_event))
+                self.p_sync_process = mp.Process(target=sync_processor_worker, args=(sync_queue, o_ring_sync, stop_event, record_enabled, output_directory))
 
                 self.p_prophesee.daemon = True
                 self.p_orbbec.daemon = True
-                self.p_sync_process.daemon = True
+                # not daemonic: the synchronizer owns a process pool of image encoders (daemons can't have children),
+                # it exits on stop_event after draining its record tasks
+                self.p_sync_process.daemon = False
 
                 self.p_prophesee.start()
                 self.p_orbbec.start()
@@ -276,10 +389,10 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
             else:
                 stop_event.set()
 
-                p_queue.cancel_join_thread()
-                o_queue.cancel_join_thread()
-                o_queue_sync.cancel_join_thread()
-                slice_queue.cancel_join_thread()
+                p_ring.cancel_join_thread()
+                o_ring.cancel_join_thread()
+                o_ring_sync.cancel_join_thread()
+                sync_queue.cancel_join_thread()
 
                 self.p_prophesee.join(timeout=1)
                 self.p_orbbec.join(timeout=1)
@@ -287,25 +400,45 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
                 self.start_button.setText("START SENSORS")
                 self.start_button.setStyleSheet("background-color: #2E7D32; color: white; border-radius: 10px;")
 
-        def poll_queue(self):
-            # for visualization
-            while not p_queue.empty():
-                try:
-                    ev_queue_element = p_queue.get_nowait()
-                    ev_frame = ev_queue_element['frame']
-                    # frame timestamp, not precise, just for debugging
-                    # ev_frame_ts = ev_queue_element['ts']
-                    # print(f"[POLL QUEUE] Event Frame Timestamp: {ev_frame_ts}")
-                    self.v_ev.update_frame(ev_frame)
-                except: break
-
-            while not o_queue.empty():
-                try:
-                    data = o_queue.get_nowait()
-                    if 'rgb' in data: self.v_rgb.update_frame(data['rgb'])
-                    if 'depth' in data: self.v_depth.update_frame(data['depth'])
-                    if 'pc' in data: self.v_pc.update_pc(data['pc'])
-                except: break
+        # for visualization, called in the UI thread through the reader signals
+        def on_ev_frame(self, ring_item):
+            slot, frames, meta = ring_item
+            try:
+                # frame timestamp, not precise, just for debugging
+                # ev_frame_ts = meta['ts']
+                # print(f"[EV READER] Event Frame Timestamp: {ev_frame_ts}")
+                self.v_ev.update_frame(frames['frame'])
+            except Exception as e:
+                # an exception escaping a Qt slot aborts the whole GUI, skip the frame instead
+                print(f"[UI] Skipping event frame: {e}")
+            finally:
+                p_ring.release(slot)
+
+        def on_rgbd_frame(self, ring_item):
+            slot, frames, meta = ring_item
+            try:
+                # views into shared memory, only valid until the slot is released
+                self.v_rgb.update_frame(frames['rgb'], is_rgb=meta['is_rgb'])
+                self.v_depth.update_frame(frames['depth'])
+                self.v_pc.update_pc(frames['pc'])
+            except Exception as e:
+                print(f"[UI] Skipping orbbec frame: {e}")
+            finally:
+                o_ring.release(slot)
+
+        def stop_readers(self):
+            for reader in (self.ev_reader, self.rgbd_reader):
+                reader.stop_flag = True
+            for reader in (self.ev_reader, self.rgbd_reader):
+                reader.wait()
+
+        def shutdown(self):
+            self.stop_readers()
+            stop_event.set()
+            # let the synchronizer drain its record tasks, the encoders read the sync ring,
+            # which is unlinked once run_ui returns
+            if self.p_sync_process is not None:
+                self.p_sync_process.join(timeout=SYNC_DRAIN_TIMEOUT_S)
 
     # Apply environment scaling before app creation
     os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
@@ -313,6 +446,7 @@ def run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, record_enabl
 
     app = QApplication(sys.argv)
     win = MainWindow()
+    app.aboutToQuit.connect(win.shutdown)
     win.show()
     sys.exit(app.exec_())
 
@@ -331,13 +465,26 @@ if __name__ == "__main__":
         mp.set_start_method('spawn', force=True)
     except RuntimeError: pass
     
-    p_queue = mp.Queue(maxsize=1)
-    o_queue = mp.Queue(maxsize=1)
-    o_queue_sync = mp.Queue(maxsize=5)
-    slice_queue = mp.Queue(maxsize=5)
+    rgb_nbytes = ORB_WIDTH * ORB_HEIGHT * 3
+    depth_nbytes = ORB_WIDTH * ORB_HEIGHT * np.dtype(np.uint16).itemsize
+    pc_nbytes = PC_MAX_POINTS * 6 * np.dtype(np.float32).itemsize
+
+    p_ring = SharedFrameRing({'frame': EV_MAX_WIDTH * EV_MAX_HEIGHT * 3}, n_slots=3)
+    o_ring = SharedFrameRing({'rgb': rgb_nbytes, 'depth': ORB_WIDTH * ORB_HEIGHT, 'pc': pc_nbytes}, n_slots=3)
+    # event slices and sync ring frames share one queue, the synchronizer blocks on it alone.
+    # every frame message owns one of the 16 slots, on top of that there is room for 5 slices
+    sync_queue = mp.Queue(maxsize=16 + 5)
+    # the synchronizer keeps unmatched and not yet written frames in their slots, ~0.5s at 30fps
+    o_ring_sync = SharedFrameRing({'rgb': rgb_nbytes, 'depth': depth_nbytes}, n_slots=16, index_queue=sync_queue, tag='orb')
     stop_event = mp.Event()
 
     try:
-        run_ui(p_queue, o_queue, o_queue_sync, slice_queue, stop_event, args.record, args.output_directory)
+        run_ui(p_ring, o_ring, o_ring_sync, sync_queue, stop_event, args.record, args.output_directory)
     except KeyboardInterrupt:
-        stop_event.set()
\ No newline at end of file
+        pass
+    finally:
+        # also on a plain window close, the non-daemonic synchronizer is joined at interpreter exit
+        stop_event.set()
+        p_ring.unlink()
+        o_ring.unlink()
+        o_ring_sync.unlink()
\ No newline at end of file
@@ -2,70 +2,105 @@ import os
 import cv2
 import numpy as np
 from pprint import pprint
-from typing import Union, Any, Optional
+from typing import Union, Any, Optional, Tuple
 from pyorbbecsdk import OBFormat, VideoFrame
+from pc_filter import parse_points
 
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+
+if cp is not None:
+    # back-projects every stride-th pixel of the color-aligned depth map with the color intrinsics, one thread per point,
+    # writes the same (6, N) [x, y, z, r, g, b] rows as parse_points (colors as 0..255 floats, mm units)
+    _depth_to_points = cp.ElementwiseKernel(
+        'raw uint16 depth, raw uint8 color, float32 scale, float32 fx, float32 fy, float32 cx, float32 cy, '
+        'int32 width, int32 stride, int32 n, int32 r_ch, int32 b_ch',
+        'raw float32 pc',
+        '''
+        int p = i * stride;
+        int u = p % width;
+        int v = p / width;
+        float z = depth[p] * scale;
+        pc[i] = (u - cx) * z / fx;
+        pc[n + i] = (v - cy) * z / fy;
+        pc[2 * n + i] = z;
+        pc[3 * n + i] = color[3 * p + r_ch];
+        pc[4 * n + i] = color[3 * p + 1];
+        pc[5 * n + i] = color[3 * p + b_ch];
+        ''',
+        'orbbec_depth_to_points')
+
+def cuda_available() -> bool:
+    if cp is None:
+        return False
+    try:
+        return cp.cuda.runtime.getDeviceCount() > 0
+    except Exception:
+        return False
+
+# cvtColor reads the planar/semi-planar YUV layout directly from a (height * 3 / 2, width) view,
+# so the raw buffer is only reshaped (no copy) instead of being split and merged first
 def i420_to_bgr(frame: np.ndarray, width: int, height: int) -> np.ndarray:
-    y = frame[0:height, :]
-    u = frame[height:height + height // 4].reshape(height // 2, width // 2)
-    v = frame[height + height // 4:].reshape(height // 2, width // 2)
-    yuv_image = cv2.merge([y, u, v])
-    bgr_image = cv2.cvtColor(yuv_image, cv2.COLOR_YUV2BGR_I420)
-    return bgr_image
+    return cv2.cvtColor(frame.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420)
 
 def nv21_to_bgr(frame: np.ndarray, width: int, height: int) -> np.ndarray:
-    y = frame[0:height, :]
-    uv = frame[height:height + height // 2].reshape(height // 2, width)
-    yuv_image = cv2.merge([y, uv])
-    bgr_image = cv2.cvtColor(yuv_image, cv2.COLOR_YUV2BGR_NV21)
-    return bgr_image
+    return cv2.cvtColor(frame.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_NV21)
 
 
 def nv12_to_bgr(frame: np.ndarray, width: int, height: int) -> np.ndarray:
-    y = frame[0:height, :]
-    uv = frame[height:height + height // 2].reshape(height // 2, width)
-    yuv_image = cv2.merge([y, uv])
-    bgr_image = cv2.cvtColor(yuv_image, cv2.COLOR_YUV2BGR_NV12)
-    return bgr_image
+    return cv2.cvtColor(frame.reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_NV12)
 
 
-def frame_to_bgr_image(frame: VideoFrame) -> Union[Optional[np.array], Any]:
+def frame_to_image(frame: VideoFrame) -> Tuple[Optional[np.ndarray], bool]:
+    """
+    like frame_to_bgr_image, but packed RGB/BGR frames are returned untouched (no full-frame swap pass)
+
+    :return: (image, is_rgb), is_rgb tells whether the image is in RGB instead of BGR byte order
+    """
     width = frame.get_width()
     height = frame.get_height()
     color_format = frame.get_format()
     data = np.asanyarray(frame.get_data())
-    image = np.zeros((height, width, 3), dtype=np.uint8)
+    # packed formats are viewed in place (np.resize used to copy, and silently pad/truncate on a size mismatch),
+    # cvtColor allocates the output anyway
     if color_format == OBFormat.RGB:
-        image = np.resize(data, (height, width, 3))
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3), True
     elif color_format == OBFormat.BGR:
-        image = np.resize(data, (height, width, 3))
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3), False
     elif color_format == OBFormat.YUYV:
-        image = np.resize(data, (height, width, 2))
+        image = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 2)
         image = cv2.cvtColor(image, cv2.COLOR_YUV2BGR_YUYV)
     elif color_format == OBFormat.MJPG:
         image = cv2.imdecode(data, cv2.IMREAD_COLOR)
     elif color_format == OBFormat.I420:
         image = i420_to_bgr(data, width, height)
-        return image
     elif color_format == OBFormat.NV12:
         image = nv12_to_bgr(data, width, height)
-        return image
     elif color_format == OBFormat.NV21:
         image = nv21_to_bgr(data, width, height)
-        return image
     elif color_format == OBFormat.UYVY:
-        image = np.resize(data, (height, width, 2))
+        image = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 2)
         image = cv2.cvtColor(image, cv2.COLOR_YUV2BGR_UYVY)
     else:
         print("Unsupported color format: {}".format(color_format))
-        return None
+        return None, False
+    return image, False
+
+
+def frame_to_bgr_image(frame: VideoFrame) -> Union[Optional[np.array], Any]:
+    image, is_rgb = frame_to_image(frame)
+    if is_rgb:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
     return image
 
 
 class OrbbecCamera:
-    def __init__(self):
+    def __init__(self, pc_stride=1):
+        """
+        :param pc_stride: keep every pc_stride-th point of the point cloud, the GPU path only computes those
+        """
         from pyorbbecsdk import (
             Pipeline, Config, 
             OBSensorType, OBStreamType, 
@@ -82,6 +117,7 @@ class OrbbecCamera:
         self.config.enable_stream(d_profiles.get_default_video_stream_profile())
         
         self.has_color = False
+        self.color_intrinsics = None
         try:
             c_profiles = self.pipeline.get_stream_profile_list(OBSensorType.COLOR_SENSOR)
             color_profile = c_profiles.get_default_video_stream_profile()
@@ -90,6 +126,7 @@ class OrbbecCamera:
             # get color intrinsics, the depth intrinsics are not used as it is projected to color
             color_intrinsics = color_profile.get_intrinsic()
             print("Color Intrinsics: {}".format(color_intrinsics))
+            self.color_intrinsics = color_intrinsics
             color_distortion = color_profile.get_distortion()
             print("Color Distortion: {}".format(color_distortion))
 
@@ -114,8 +151,13 @@ class OrbbecCamera:
         self.align = AlignFilter(align_to_stream=OBStreamType.COLOR_STREAM) # software D2C, for now the hardware D2C has some problems
         self.pc_filter = PointCloudFilter()
         self.pc_filter.set_camera_param(self.pipeline.get_camera_param())
+        # with a CUDA device the colored point cloud is computed on the GPU instead of the SDK's CPU PointCloudFilter
+        self.gpu_pc = self.has_color and self.color_intrinsics is not None and cuda_available()
+        print(f"[Orbbec] point cloud on {'GPU (CuPy)' if self.gpu_pc else 'CPU (PointCloudFilter)'}")
+        self.pc_stride = pc_stride
 
         self.first_frame_log_flag = True
+        self.color_is_rgb = False # byte order of the last color frame returned by get_frames
 
     def get_frames(self):
         from pyorbbecsdk import OBFormat
@@ -141,7 +183,7 @@ class OrbbecCamera:
                 print(f"[First Depth Frame] depth frame timestamp from camera booting: {o_d_ts} us , system timestamp: {d_frame.get_system_timestamp_us()} us")
                 self.first_frame_log_flag = False
             if c_frame is not None:
-                c_img = frame_to_bgr_image(c_frame)
+                c_img, self.color_is_rgb = frame_to_image(c_frame)
                 # just for debugging, python cpu code introduce too much delay
                 # alpha-blending the depth to color image to test D2C accuracy
                 # depth_data = np.frombuffer(d_frame.get_data(), dtype=np.uint16).reshape(
@@ -161,6 +203,16 @@ class OrbbecCamera:
             if d_frame is None or c_frame is None:
                 return None, None, None, 0, 0
             
+            if d_frame is not None:
+                d_img = np.frombuffer(d_frame.get_data(), dtype=np.uint16).reshape(
+                    d_frame.get_height(), d_frame.get_width())
+            else:
+                return None, None, None, 0, 0
+
+            if self.gpu_pc:
+                pc_data = self.points_on_gpu(d_img, c_img, d_frame.get_depth_scale())
+                return c_img, d_img, pc_data, o_c_ts, o_d_ts
+
             point_format = OBFormat.RGB_POINT if self.has_color and c_frame is not None else OBFormat.POINT
             self.pc_filter.set_create_point_format(point_format)
             pc_frame = self.pc_filter.process(aligned)
@@ -170,22 +222,39 @@ class OrbbecCamera:
                 raw_data = np.frombuffer(pc_frame.get_data(), dtype=np.float32)
                 if point_format == OBFormat.RGB_POINT:
                     # RGB_POINT style is [x, y, z, r, g, b, ...]
-                    # reshape to (-1, 6)
-                    pc_data = raw_data.reshape(-1, 6)
+                    # de-interleaved to (6, N / pc_stride), one contiguous row per column
+                    pc_data = parse_points(raw_data, 6, self.pc_stride)
                 else:
                     # POINT style is [x, y, z, ...]
-                    pc_data = raw_data.reshape(-1, 3)
-            
-            if d_frame is not None:
-                d_img = np.frombuffer(d_frame.get_data(), dtype=np.uint16).reshape(
-                    d_frame.get_height(), d_frame.get_width())
-            else:
-                return None, None, None, 0, 0
+                    pc_data = parse_points(raw_data, 3, self.pc_stride)
             
             return c_img, d_img, pc_data, o_c_ts, o_d_ts
         except Exception as e:
             print(f"Orbbec inner error: {e}")
             return None, None, None, 0, 0
 
+    def points_on_gpu(self, d_img, c_img, depth_scale):
+        """
+        :param d_img: (H, W) uint16 depth aligned to the color stream
+        :param c_img: (H, W, 3) uint8 color image, channel order given by self.color_is_rgb
+        :param depth_scale: mm per depth unit
+        :return: (6, M) float32 host array of the valid (z > 0) points among every pc_stride-th pixel,
+            same rows as the CPU path
+        """
+        intr = self.color_intrinsics
+        h, w = d_img.shape
+        n = (h * w + self.pc_stride - 1) // self.pc_stride
+        d_gpu = cp.asarray(d_img).ravel()
+        c_gpu = cp.asarray(c_img).ravel()
+        pc_gpu = cp.empty((6, n), dtype=cp.float32)
+        r_ch, b_ch = (0, 2) if self.color_is_rgb else (2, 0)
+        _depth_to_points(d_gpu, c_gpu, np.float32(depth_scale),
+                         np.float32(intr.fx), np.float32(intr.fy), np.float32(intr.cx), np.float32(intr.cy),
+                         np.int32(w), np.int32(self.pc_stride), np.int32(n), np.int32(r_ch), np.int32(b_ch), pc_gpu,
+                         size=n)
+        # the cloud is rendered in the UI process, so it has to come back to host memory for the shared memory ring,
+        # the points without depth are dropped on the device first
+        return pc_gpu[:, pc_gpu[2] > 0].get()
+
     def stop(self):
         self.pipeline.stop()
\ No newline at end of file
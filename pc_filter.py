@@ -0,0 +1,169 @@
+import numpy as np
+from numba import njit, prange
+
+N_BLOCKS = 64 # work split for the parallel compaction
+
+@njit(parallel=True, nogil=True, cache=True)
+def parse_points(raw, n_cols, stride=1):
+    """
+    de-interleave the SDK point buffer ([x, y, z(, r, g, b)] per point) into one contiguous row per column,
+    so later passes read each column with unit stride instead of gathering across the point stride.
+
+    :param raw: flat float32 array straight from the point cloud frame
+    :param n_cols: 3 for POINT, 6 for RGB_POINT
+    :param stride: only every stride-th point is read and written
+    :return: (n_cols, ceil(N / stride)) float32 array
+    """
+    n = (raw.shape[0] // n_cols + stride - 1) // stride
+    soa = np.empty((n_cols, n), dtype=np.float32)
+    for i in prange(n):
+        p = i * stride * n_cols
+        for k in range(n_cols):
+            soa[k, i] = raw[p + k]
+    return soa
+
+@njit(parallel=True, nogil=True, cache=True)
+def filter_and_colorize(pc, pos, rgba):
+    """
+    keep the points with z > 0 and build their display colors in one pass over the cloud,
+    written into caller owned buffers so no frame allocates its own output.
+
+    :param pc: (6, N) float32 array with rows x, y, z, r, g, b, colors in [0, 255]
+    :param pos: (>= M, 3) float32 output buffer
+    :param rgba: (>= M, 4) float32 output buffer, the alpha column is left untouched (set it once)
+    :return: M, the valid points are in pos[:M] and rgba[:M]
+    """
+    n = pc.shape[1]
+    block = (n + N_BLOCKS - 1) // N_BLOCKS
+
+    # first pass: count valid points per block, so every block knows where to write
+    counts = np.zeros(N_BLOCKS + 1, dtype=np.int64)
+    for b in prange(N_BLOCKS):
+        c = 0
+        for i in range(b * block, min(n, (b + 1) * block)):
+            if pc[2, i] > 0:
+                c += 1
+        counts[b + 1] = c
+    offsets = np.cumsum(counts)
+    if offsets[N_BLOCKS] > pos.shape[0] or offsets[N_BLOCKS] > rgba.shape[0]:
+        raise ValueError("filter_and_colorize: output buffers are smaller than the number of valid points")
+
+    # second pass: copy positions and normalize colors (dimmed to 0.8) straight into the outputs
+    for b in prange(N_BLOCKS):
+        j = offsets[b]
+        for i in range(b * block, min(n, (b + 1) * block)):
+            if pc[2, i] > 0:
+                pos[j, 0] = pc[0, i]
+                pos[j, 1] = pc[1, i]
+                pos[j, 2] = pc[2, i]
+                for k in range(3):
+                    rgba[j, k] = min(max(pc[3 + k, i] * np.float32(1.0 / 255.0), 0.0), 1.0) * np.float32(0.8)
+                j += 1
+    return offsets[N_BLOCKS]
+
+MORTON_INVALID = 0xFFFFFFFF # code of the z <= 0 points, sorts them to the end
+
+@njit(nogil=True, cache=True)
+def _part1by2(v):
+    # spread the low 10 bits of v onto every third bit
+    v &= 0x3ff
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+@njit(parallel=True, nogil=True, cache=True)
+def _morton_codes(pc):
+    n = pc.shape[1]
+    x_lo, y_lo, z_lo = np.inf, np.inf, np.inf
+    x_hi, y_hi, z_hi = -np.inf, -np.inf, -np.inf
+    for i in prange(n):
+        if pc[2, i] > 0:
+            x_lo = min(x_lo, pc[0, i])
+            y_lo = min(y_lo, pc[1, i])
+            z_lo = min(z_lo, pc[2, i])
+            x_hi = max(x_hi, pc[0, i])
+            y_hi = max(y_hi, pc[1, i])
+            z_hi = max(z_hi, pc[2, i])
+    # quantize the bounding box of the valid points to 10 bits per axis
+    x_s = 1023.0 / max(x_hi - x_lo, 1e-6)
+    y_s = 1023.0 / max(y_hi - y_lo, 1e-6)
+    z_s = 1023.0 / max(z_hi - z_lo, 1e-6)
+
+    codes = np.empty(n, dtype=np.uint32)
+    for i in prange(n):
+        if pc[2, i] > 0:
+            qx = np.uint32((pc[0, i] - x_lo) * x_s)
+            qy = np.uint32((pc[1, i] - y_lo) * y_s)
+            qz = np.uint32((pc[2, i] - z_lo) * z_s)
+            codes[i] = _part1by2(qx) | (_part1by2(qy) << 1) | (_part1by2(qz) << 2)
+        else:
+            codes[i] = MORTON_INVALID
+    return codes
+
+@njit(nogil=True, cache=True)
+def _radix_sort_codes(codes):
+    # LSD radix sort, 3 passes of 11 bits over the 30 bit codes (+ the invalid marker).
+    # point indices travel with their keys, so no pass gathers through an index array
+    n = codes.shape[0]
+    keys = codes.copy()
+    order = np.arange(n).astype(np.int32)
+    keys_tmp = np.empty_like(keys)
+    order_tmp = np.empty_like(order)
+    for shift in (0, 11, 22):
+        count = np.zeros(2049, dtype=np.int64)
+        for i in range(n):
+            count[((keys[i] >> shift) & 0x7FF) + 1] += 1
+        for b in range(2048):
+            count[b + 1] += count[b]
+        for i in range(n):
+            d = (keys[i] >> shift) & 0x7FF
+            p = count[d]
+            keys_tmp[p] = keys[i]
+            order_tmp[p] = order[i]
+            count[d] = p + 1
+        keys, keys_tmp = keys_tmp, keys
+        order, order_tmp = order_tmp, order
+    return keys, order
+
+@njit(nogil=True, cache=True)
+def _scan_keep(pc, keys, order, r_filter):
+    # walk the points in Z-order, keep one only if it is farther than r_filter from the last kept point
+    r2 = r_filter * r_filter
+    keep = np.empty(order.shape[0], dtype=np.int64)
+    m = 0
+    lx, ly, lz = 0.0, 0.0, 0.0
+    for o in range(order.shape[0]):
+        if keys[o] == MORTON_INVALID:
+            break
+        i = order[o]
+        x, y, z = pc[0, i], pc[1, i], pc[2, i]
+        if m > 0:
+            dx, dy, dz = x - lx, y - ly, z - lz
+            if dx * dx + dy * dy + dz * dz <= r2:
+                continue
+        keep[m] = i
+        m += 1
+        lx, ly, lz = x, y, z
+    return keep[:m]
+
+def morton_filter(pc, r_filter, max_points):
+    """
+    density preserving decimation: sort the valid (z > 0) points along a Z-order curve and drop
+    every point within r_filter of the previously kept one. Neighbours on the curve are neighbours in space,
+    so dense regions are thinned while sparse ones keep their points, unlike a fixed stride.
+    O(n) codes + O(n) radix sort + O(n) scan.
+
+    :param pc: (C, N) float32 array with x, y, z in the first three rows
+    :param r_filter: minimum distance between consecutive kept points, same unit as the cloud (mm)
+    :param max_points: cap on the number of returned points, reached by keeping every k-th point of the walk
+    :return: (C, M) array of the kept points
+    """
+    codes = _morton_codes(pc)
+    keys, order = _radix_sort_codes(codes)
+    keep = _scan_keep(pc, keys, order, r_filter)
+    if keep.shape[0] > max_points:
+        # over budget: thin evenly along the whole curve, stopping the walk early would cut off part of the scene
+        keep = keep[::-(-keep.shape[0] // max_points)]
+    return pc[:, keep]
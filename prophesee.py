@@ -1,17 +1,18 @@
 import sys
 import time
 import numpy as np
+from queue import Full
 
 if "/usr/lib/python3/dist-packages/" not in sys.path:
     sys.path.append("/usr/lib/python3/dist-packages/")
 
 from metavision_core.event_io.raw_reader import initiate_device # type: ignore
-from metavision_core.event_io import EventsIterator # type: ignore
 from metavision_sdk_core import PeriodicFrameGenerationAlgorithm # type: ignore
-from metavision_sdk_ui import EventLoop # type: ignore
 import metavision_hal # type: ignore
 from pprint import pprint
 
+MIN_ARENA_EVENTS = 1 << 20 # ~16MB of EventCD, about 30ms at 30Mev/s
+
 class PropheseeCamera:
     def __init__(self, accumulation_time_us=33000):
         self.device = initiate_device("")
@@ -21,78 +22,132 @@ class PropheseeCamera:
         self.device.get_i_erc_module().set_cd_event_rate(20000000) # 20M maximum event rate to avoid stutter
         i_trigger_in = self.device.get_i_trigger_in()
         i_trigger_in.enable(metavision_hal.I_TriggerIn.Channel.MAIN) 
-        self.iterator = EventsIterator.from_device(device=self.device)
-        self.height, self.width = self.iterator.get_size()
+        # raw HAL streaming: decoded event buffers are delivered to callbacks, no EventsIterator in between
+        self.events_stream = self.device.get_i_events_stream()
+        self.stream_decoder = self.device.get_i_events_stream_decoder()
+        self.cd_decoder = self.device.get_i_event_cd_decoder()
+        self.trigger_decoder = self.device.get_i_event_ext_trigger_decoder()
+        geometry = self.device.get_i_geometry()
+        self.width, self.height = geometry.get_width(), geometry.get_height()
         self.accumulation_time_us = accumulation_time_us
         self.frame_gen = None
 
-        # buffer for unsliced events
-        self.event_buffer = []
+        # arena the decoder callback copies every CD buffer into, the only copy an event gets before its slice is sent.
+        # arena[slice_start:batch_start] is the pending (unsliced) part of the current slice,
+        # arena[batch_start:arena_len] the events decoded since the last process_batch().
+        # allocated with the first buffer's dtype, compacted or grown by doubling when it runs out of room
+        self.arena = None
+        self.arena_len = 0
+        self.slice_start = 0
+        self.batch_start = 0
         self.last_trigger_ts = None
         self.active = False
 
-    def start_loop(self, p_queue, slice_queue, stop_event):
+    def start_loop(self, p_ring, sync_queue, stop_event):
         self.frame_gen = PeriodicFrameGenerationAlgorithm(sensor_width=self.width, sensor_height=self.height,
                                                             accumulation_time_us=self.accumulation_time_us, fps=30)
         def on_cd_frame_cb(ts, cd_frame): # this timestamp is PeriodicFrameGenerationAlgorithm's timestamp, not precise
-            if not p_queue.full():
-                p_queue.put({'frame': cd_frame.copy(), 'ts':ts})
+            # copied once straight into a shared memory slot (no .copy() + pickle),
+            # the preview only wants the newest frame so a frame the UI has not picked up yet is replaced
+            p_ring.put({'frame': cd_frame}, drop_oldest=True, ts=ts)
         self.frame_gen.set_output_callback(on_cd_frame_cb)
-        print("[Prophesee] Waiting for the first trigger to start slicing...")
 
-        for evs in self.iterator:
-            EventLoop.poll_and_dispatch()
-            self.frame_gen.process_events(evs) # for ui displaying
-            
-            triggers = self.iterator.reader.get_ext_trigger_events()
-            if triggers.size > 0:
-                rising_edges = triggers[triggers['p'] == 1]
-                for trig in rising_edges:
-                    current_trig_ts = trig['t']
-                    if not self.active:
-                        # first activation
-                        self.active = True
-                        self.last_trigger_ts = current_trig_ts
-
-                        # check whether current evs has event after trigger
-                        if evs.size > 0:
-                            post_trigger_evs = evs[evs['t'] > current_trig_ts]
-                            if post_trigger_evs.size > 0:
-                                self.event_buffer.append(post_trigger_evs.copy())
-
-                        print(f"[Prophesee] First trigger at {current_trig_ts}.")
-                    else:
-                        # later trigger, do the slicing as normal case
-                        # put the current-batch's events(before this trigger, belongs to the last slice) into buffer
-                        pre_trigger_mask = evs['t'] <= current_trig_ts
-                        if np.any(pre_trigger_mask):
-                            self.event_buffer.append(evs[pre_trigger_mask].copy())
-
-                        if len(self.event_buffer) > 0:
-                            merged_evs = np.concatenate(self.event_buffer)
-                            # slice construction completes
-                            if not slice_queue.full():
-                                slice_queue.put({
-                                    'event_volume': merged_evs,
-                                    'start_ts': self.last_trigger_ts,
-                                    'end_ts': current_trig_ts
-                                })
-                            else:
-                                print("[WARNNING!!!] [Prophesee] Slice queue is full. Skipping this slice.")
-                        
-                        # refresh last_trigger_ts(slice start point), 
-                        # and put the current-batch's events(after this trigger) into buffer for later slice creation.
-                        self.last_trigger_ts = current_trig_ts
-                        post_trigger_evs = evs[evs['t'] > current_trig_ts]
-                        self.event_buffer = [post_trigger_evs.copy()] if post_trigger_evs.size > 0 else []
-            else: 
-                # current batch has no trigger, and the activation has been done, 
-                # then store all the events into buffer
-                if self.active and evs.size > 0:
-                    self.event_buffer.append(evs.copy())
-            self.iterator.reader.clear_ext_trigger_events()
-
-            if stop_event.is_set():
+        # the decoders call these from inside decode(), the buffers are only valid during the call.
+        # CD events go straight into the arena, the few trigger events are copied aside
+        pending_triggers = []
+        self.cd_decoder.add_event_buffer_callback(self.arena_append)
+        self.trigger_decoder.add_event_buffer_callback(lambda triggers: pending_triggers.append(triggers.copy()))
+
+        print("[Prophesee] Waiting for the first trigger to start slicing...")
+        self.events_stream.start()
+        while not stop_event.is_set():
+            if self.events_stream.wait_next_buffer() < 0:
                 break
-        
+            self.stream_decoder.decode(self.events_stream.get_latest_raw_data())
+            if self.arena_len == self.batch_start:
+                # triggers are kept until CD events arrive, all later events lie after them anyway
+                continue
+
+            triggers = np.concatenate(pending_triggers) if pending_triggers else None
+            pending_triggers.clear()
+
+            self.frame_gen.process_events(self.arena[self.batch_start:self.arena_len]) # for ui displaying
+            self.process_batch(sync_queue, triggers)
+
+        self.events_stream.stop()
         print("Prophesee: Headless Processing Finished.")
+
+    def process_batch(self, sync_queue, triggers):
+        """
+        cut the events decoded since the last call, arena[batch_start:arena_len], at their rising trigger edges.
+
+        :param triggers: ext trigger events decoded along with them, or None
+        """
+        batch_start, batch_end = self.batch_start, self.arena_len
+        self.batch_start = batch_end
+        rising_ts = triggers['t'][triggers['p'] == 1] if triggers is not None else np.empty(0, dtype=np.int64)
+        if not self.active and rising_ts.size == 0:
+            # nothing is kept before the first trigger
+            self.slice_start = batch_end
+            return
+
+        # event timestamps are monotonic, one searchsorted call finds every cut (t <= trigger goes left)
+        cuts = batch_start + np.searchsorted(self.arena['t'][batch_start:batch_end], rising_ts, side='right')
+        if not self.active:
+            # first activation, the events before the first trigger are dropped
+            self.active = True
+            self.last_trigger_ts = rising_ts[0]
+            self.slice_start = cuts[0]
+            print(f"[Prophesee] First trigger at {rising_ts[0]}.")
+            rising_ts, cuts = rising_ts[1:], cuts[1:]
+
+        # the events after the last trigger stay in the arena for later slice creation
+        for current_trig_ts, cut in zip(rising_ts, cuts):
+            self.finish_slice(sync_queue, current_trig_ts, cut)
+
+    def arena_append(self, evs):
+        if evs.size == 0:
+            return
+        if self.arena is None or self.arena_len + evs.size > self.arena.size:
+            self.arena_make_room(evs.size, evs.dtype)
+        needed = self.arena_len + evs.size
+        self.arena[self.arena_len:needed] = evs
+        self.arena_len = needed
+
+    def arena_make_room(self, n, dtype):
+        # only arena[slice_start:arena_len] is still needed, it moves to the front of the current or a doubled arena
+        keep = self.arena_len - self.slice_start
+        if self.arena is not None and keep + n <= self.arena.size:
+            self.arena[:keep] = self.arena[self.slice_start:self.arena_len]
+        else:
+            capacity = max(keep + n, 2 * self.arena.size if self.arena is not None else MIN_ARENA_EVENTS)
+            grown = np.empty(capacity, dtype=dtype)
+            if keep > 0:
+                grown[:keep] = self.arena[self.slice_start:self.arena_len]
+            self.arena = grown
+        self.batch_start -= self.slice_start
+        self.slice_start = 0
+        self.arena_len = keep
+
+    def finish_slice(self, sync_queue, current_trig_ts, cut):
+        """
+        the trigger at current_trig_ts closes the slice started at last_trigger_ts,
+        arena[slice_start:cut] is sent to the synchronizer.
+        """
+        # the arena is reused and put() pickles in a feeder thread, so the slice needs its own copy
+        merged_evs = self.arena[self.slice_start:cut].copy()
+
+        if merged_evs.size > 0:
+            # slice construction completes
+            try:
+                sync_queue.put_nowait(('evs', {
+                    'event_volume': merged_evs,
+                    'start_ts': self.last_trigger_ts,
+                    'end_ts': current_trig_ts
+                }))
+            except Full:
+                print("[WARNNING!!!] [Prophesee] Sync queue is full. Skipping this slice.")
+
+        # refresh last_trigger_ts(slice start point)
+        self.last_trigger_ts = current_trig_ts
+        self.slice_start = cut
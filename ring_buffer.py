@@ -0,0 +1,51 @@
+import numpy as np
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO over a preallocated object array. head only moves in popleft(), tail only in append(),
+    and a full buffer is reported to the caller instead of silently dropping the oldest item like deque(maxlen=...).
+
+    :param capacity: maximum number of items held
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = np.empty(capacity, dtype=object)
+        self.head = 0 # index of the oldest item, ever increasing
+        self.tail = 0 # index of the next free position, ever increasing
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def __getitem__(self, i):
+        n = self.tail - self.head
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("RingBuffer index out of range")
+        return self.items[(self.head + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self.head, self.tail):
+            yield self.items[i % self.capacity]
+
+    def full(self):
+        return self.tail - self.head == self.capacity
+
+    def append(self, item):
+        """
+        :return: False if the buffer is full, the item is not stored then
+        """
+        if self.tail - self.head == self.capacity:
+            return False
+        self.items[self.tail % self.capacity] = item
+        self.tail += 1
+        return True
+
+    def popleft(self):
+        if self.tail == self.head:
+            raise IndexError("pop from an empty RingBuffer")
+        pos = self.head % self.capacity
+        item = self.items[pos]
+        self.items[pos] = None # drop the reference, frames and event volumes are large
+        self.head += 1
+        return item
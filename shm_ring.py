@@ -0,0 +1,117 @@
+import numpy as np
+import multiprocessing as mp
+from queue import Empty, Full
+from multiprocessing import shared_memory
+
+class SharedFrameRing:
+    """
+    Fixed-slot shared memory ring used to pass numpy frames between processes.
+    Frame bytes are written once into a pre-allocated slot, only a tiny index message
+    {'slot': i, 'fields': {...}, **meta} goes through an mp.Queue, so no frame is pickled.
+
+    :param field_nbytes: {field name: maximum bytes of that field in one slot}
+    :param n_slots: number of slots, also the maximum number of frames in flight
+    :param index_queue: publish the index messages on this queue, shared with other producers, instead of an own one
+    :param tag: publish (tag, message) tuples so the consumer of a shared queue can tell the sources apart,
+        it turns this ring's messages into frames with open()
+    """
+    def __init__(self, field_nbytes, n_slots=4, index_queue=None, tag=None):
+        self.field_nbytes = dict(field_nbytes)
+        self.n_slots = n_slots
+        self.shms = {
+            name: [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(n_slots)]
+            for name, nbytes in self.field_nbytes.items()
+        }
+
+        # free list of slot indices, the consumer hands a slot back with release()
+        self.free_slots = mp.Queue()
+        for slot in range(n_slots):
+            self.free_slots.put(slot)
+        # every message owns a slot, so an own queue can never hold more than n_slots items
+        self.index_queue = mp.Queue(maxsize=n_slots) if index_queue is None else index_queue
+        self.tag = tag
+
+    def put(self, arrays, drop_oldest=False, **meta):
+        """
+        copy the arrays into a free slot and publish its index.
+
+        :param arrays: {field name: np.ndarray or None}
+        :param drop_oldest: when no slot is free, reclaim the oldest frame the consumer has not picked up yet
+        :return: False if the frame was dropped because no slot is available
+        """
+        try:
+            slot = self.free_slots.get_nowait()
+        except Empty:
+            if not drop_oldest or self.tag is not None:
+                # nothing to reclaim from a shared queue, its oldest message may belong to another producer
+                return False
+            # short timeout: our own latest put may still sit in the queue's feeder thread
+            try:
+                slot = self.index_queue.get(timeout=0.01)['slot']
+            except Empty:
+                return False
+
+        fields = {}
+        for name, arr in arrays.items():
+            if arr is None:
+                fields[name] = None
+                continue
+            if arr.nbytes > self.field_nbytes[name]:
+                self.free_slots.put(slot)
+                raise ValueError(f"[SharedFrameRing] '{name}' needs {arr.nbytes} bytes, slot holds {self.field_nbytes[name]}")
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=self.shms[name][slot].buf)
+            np.copyto(view, arr)
+            fields[name] = (arr.shape, arr.dtype.str)
+
+        msg = {'slot': slot, 'fields': fields, **meta}
+        try:
+            self.index_queue.put_nowait(msg if self.tag is None else (self.tag, msg))
+        except Full:
+            # only a shared queue fills up before the slots run out
+            self.free_slots.put(slot)
+            return False
+        return True
+
+    def get(self, block=True, timeout=None):
+        """
+        :return: (slot, {field name: np.ndarray view into shared memory or None}, meta)
+        the views stay valid until release(slot) is called. Raises queue.Empty like mp.Queue.get
+        """
+        msg = self.index_queue.get(block, timeout)
+        return self.open(msg if self.tag is None else msg[1])
+
+    def open(self, msg):
+        """
+        :param msg: an index message of this ring, as taken from a shared queue (without its tag)
+        :return: (slot, frames, meta) like get()
+        """
+        slot = msg.pop('slot')
+        frames = {}
+        for name, spec in msg.pop('fields').items():
+            if spec is None:
+                frames[name] = None
+            else:
+                shape, dtype = spec
+                frames[name] = np.ndarray(shape, dtype=dtype, buffer=self.shms[name][slot].buf)
+        return slot, frames, msg
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    def cancel_join_thread(self):
+        self.free_slots.cancel_join_thread()
+        self.index_queue.cancel_join_thread()
+
+    def unlink(self):
+        # only the creating process should call this, once every consumer is gone
+        for shm_list in self.shms.values():
+            for shm in shm_list:
+                try:
+                    shm.close()
+                except BufferError:
+                    # a numpy view is still alive somewhere, the segment goes away with the process
+                    pass
+                shm.unlink()
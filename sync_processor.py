@@ -1,21 +1,171 @@
+import os
 import cv2
 import time
 import h5py
+import threading
 import numpy as np
+import multiprocessing as mp
 from queue import Empty
-from collections import deque
-from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from ring_buffer import RingBuffer
+
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+try:
+    import blosc2
+except ImportError:
+    blosc2 = None
+
+try:
+    from nvjpeg import NvJpeg # pynvjpeg, GPU JPEG encoding
+except ImportError:
+    NvJpeg = None
+
+EVENT_CHUNK_LEN = 65536 # events per chunk of the flat events dataset (1MB of EventCD)
+INDEX_ROWS_PER_CHUNK = 64 # slices per chunk of the offset / start_ts / end_ts index datasets
+H5_CHUNK_CACHE_BYTES = 4 * 1024 * 1024
+H5_FLUSH_EVERY = 64 # flush every 64 writes, about twice a second at 30fps
+EVS_BUFFER_CAPACITY = 128 # event slices waiting for their orbbec frame, ~4s at 30fps
+MONITOR_INTERVAL_NS = 5_000_000_000
+SYNC_WAIT_S = 0.002 # blocking wait on the sync queue, bounds the stop_event latency
+RECORD_MAX_IN_FLIGHT = 8 # records being written at once, at most half of the sync ring slots
+RECORD_ACQUIRE_TIMEOUT_S = 0.001 # how long the sync loop stalls on a full writer before dropping the pair
+SYNC_CPUS = 2 # lowest CPUs kept for the sync loop when the writers are pinned away from it
+
+def event_compression():
+    """
+    h5py create_dataset kwargs for the event volumes: Blosc/LZ4 with byte shuffle when hdf5plugin is installed,
+    the built-in LZF with shuffle otherwise. Both are several times cheaper than gzip at similar ratios.
+    """
+    if hdf5plugin is not None:
+        return dict(hdf5plugin.Blosc(cname='lz4', clevel=5, shuffle=hdf5plugin.Blosc.SHUFFLE))
+    return {'compression': "lzf", 'shuffle': True}
+
+DEPTH_CHUNKS = (128, 128) # clamped to the depth map shape when the dataset is created
+
+def depth_compression():
+    """
+    h5py create_dataset kwargs for the depth maps when blosc2 is not available:
+    Zstd through hdf5plugin, LZF with shuffle otherwise. Both are lossless and far cheaper than PNG's DEFLATE.
+    """
+    if hdf5plugin is not None:
+        return dict(hdf5plugin.Zstd(clevel=3))
+    return {'compression': "lzf", 'shuffle': True}
+
+def split_cpus():
+    """
+    split the CPUs this process may run on into the sync loop's (the SYNC_CPUS lowest) and the writers' (the rest).
+
+    :return: (sync cpus, writer cpus), or None without os.sched_setaffinity (Linux only) or with too few CPUs to split
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        return None
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < SYNC_CPUS + 2:
+        return None
+    return set(cpus[:SYNC_CPUS]), set(cpus[SYNC_CPUS:])
+
+def pin_to_cpus(cpus):
+    # pid 0 is the calling thread, so as a pool initializer this pins just that worker thread / process
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        print(f"[SensorSynchronizer] Could not pin to CPUs {sorted(cpus)}: {e}")
+
+def write_image(path, img, params=()):
+    """
+    encode in memory with cv2.imencode and write the bytes with a single os.write on a raw fd,
+    skipping imwrite's own path handling and buffered file I/O. The format follows the file extension.
+    """
+    ok, buf = cv2.imencode(os.path.splitext(path)[1], img, params)
+    if not ok:
+        raise RuntimeError(f"encoding {path} failed")
+    write_bytes(path, buf)
+
+def write_bytes(path, buf):
+    view = memoryview(buf).cast('B')
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def pack_array(arr, codec='LZ4', clevel=5):
+    """
+    compress an array with blosc2 (+ shuffle) outside of HDF5, so the writer threads compress in parallel
+    and only the finished bytes go through the HDF5 lock. Read back with blosc2.unpack_array2(buf.tobytes()).
+
+    :param codec: name of a blosc2.Codec member, the depth maps use ZSTD
+    :return: uint8 array of the packed array
+    """
+    packed = blosc2.pack_array2(arr, cparams={'codec': blosc2.Codec[codec], 'clevel': clevel, 'filters': [blosc2.Filter.SHUFFLE]})
+    return np.frombuffer(packed, dtype=np.uint8)
+
+# encoder process state: shared memory segments attached so far (by name) and the lazily created nvJPEG encoder
+_attached_shms = {}
+_nvjpeg = None
+
+def _attach_frame(spec):
+    name, shape, dtype = spec
+    shm = _attached_shms.get(name)
+    if shm is None:
+        shm = _attached_shms[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def warm_up_task():
+    # no-op, importing this module (cv2, numpy) is the start-up cost a first real task would otherwise pay
+    return os.getpid()
+
+def encode_rgb_task(frame_dir, idx_str, rgb_spec, is_rgb):
+    """
+    runs in an encoder process: reads the color frame straight from the sync ring slot and writes its jpg.
+
+    :param rgb_spec: (shared memory name, shape, dtype str) of the color frame
+    """
+    global _nvjpeg
+    try:
+        if rgb_spec is not None:
+            rgb = _attach_frame(rgb_spec)
+            # RGB/BGR color formats arrive without the byte swap, the encoders expect BGR
+            rgb_img = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR) if is_rgb else rgb
+            rgb_path = os.path.join(frame_dir, f"{idx_str}_rgb.jpg")
+            if _nvjpeg is None and NvJpeg is not None:
+                try:
+                    _nvjpeg = NvJpeg()
+                except Exception as e:
+                    print(f"[SensorSynchronizer] nvJPEG unavailable, encoding on CPU: {e}")
+                    _nvjpeg = False
+            if _nvjpeg:
+                write_bytes(rgb_path, _nvjpeg.encode(rgb_img, 95))
+            else:
+                write_image(rgb_path, rgb_img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+    except Exception as e:
+        print(f"[ASYNC RECORD ERROR] RGB task {idx_str} failed: {e}")
 
 class SensorSynchronizer:
-    def __init__(self, slice_queue, o_queue_sync, stop_event, record_enabled, output_directory):
-        self.slice_queue = slice_queue
-        self.o_queue_sync = o_queue_sync
+    def __init__(self, sync_queue, o_ring_sync, stop_event, record_enabled, output_directory):
+        # both inputs arrive on one queue as tagged tuples: ('evs', slice dict) from the event camera
+        # and ('orb', index message) published by o_ring_sync
+        self.sync_queue = sync_queue
+        self.o_ring_sync = o_ring_sync
         self.stop_event = stop_event
 
-        self.evs_buffer = deque(maxlen=100)
-        self.orb_buffer = deque(maxlen=100)
-
-        self.diff_samples = [] # just for monitoring now
+        self.evs_buffer = RingBuffer(EVS_BUFFER_CAPACITY)
+        # orbbec frames stay in their sync ring slots (the slots are the frame pool) until they are dropped or written.
+        # one slot less than the ring has, so the producer always finds a free slot for the frame that evicts the oldest
+        self.orb_buffer = RingBuffer(o_ring_sync.n_slots - 1)
+        self.orb_ts = RingBuffer(o_ring_sync.n_slots - 1) # rgb_ts of orb_buffer, kept in step with it for the binary search
+        self._orb_ts_arr = None # int64 copy of orb_ts for searchsorted, rebuilt lazily after the buffer changed
+
+        # running match error statistics since the last monitor tick, just for monitoring now
+        self.diff_sum = 0
+        self.diff_max = 0
+        self.diff_count = 0
         self.initial_delta_monitoring = None # just for monitoring now
         
         self.delta_orb_to_evs = None # totally trust the first frame capture of hardwares
@@ -23,17 +173,63 @@ class SensorSynchronizer:
         # the interval between two consecutive frames is 33ms for now (30fps), thus 5ms is far more less than 33ms
         self.warning_threshold_us = 2000
 
-        self.last_monitor_time = time.time()
+        self.last_monitor_time = time.monotonic_ns()
         self.drift_alpha = 0.01 # fine-tuning delta
 
         self.record_enabled = record_enabled
         self.output_directory = output_directory
         self.record_idx = 0
 
+        # taken before the sync loop pins itself, afterwards the affinity mask is only the sync CPUs
+        self.cpu_split = split_cpus()
+
         if self.record_enabled:
-            worker_count = 8
-            self.executor = ThreadPoolExecutor(max_workers=worker_count)
-            print(f"[SensorSynchronizer] Record enabled. ThreadPoolExecutor started with {worker_count} workers.")
+            # session sub directories, joined once here instead of per record
+            self.event_dir = self.output_directory / "event"
+            self.frame_dir = self.output_directory / "frame"
+            self.event_dir.mkdir(parents=True, exist_ok=True)
+            self.frame_dir.mkdir(parents=True, exist_ok=True)
+            self.frame_dir_str = str(self.frame_dir) # what the encoder processes get
+            # writer threads and encoder processes stay off the sync loop's CPUs when there are enough of them
+            pin_kwargs = {'initializer': pin_to_cpus, 'initargs': (self.cpu_split[1],)} if self.cpu_split else {}
+            # HDF5 serializes every call under one lock, so the writes keep a couple of threads
+            # while image encoding, the CPU heavy part, runs in its own processes.
+            # the events get their own single thread, their slices are appended in record order
+            self.executor = ThreadPoolExecutor(max_workers=2, **pin_kwargs)
+            self.event_writer = ThreadPoolExecutor(max_workers=1, **pin_kwargs)
+            worker_count = min(8, len(self.cpu_split[1]) if self.cpu_split else os.cpu_count() or 1)
+            # the synchronizer itself is a spawned process, its default start method would be fork
+            self.encode_pool = ProcessPoolExecutor(max_workers=worker_count, mp_context=mp.get_context('spawn'),
+                                                   **pin_kwargs)
+            # spawn workers only start on demand, start them all now instead of on the first recorded frames
+            warm_up = [self.encode_pool.submit(warm_up_task) for _ in range(worker_count)]
+            for future in warm_up:
+                future.result()
+            # one events file for the whole session: all slices are appended to one flat, chunked and compressed
+            # 'events' dataset, slice i is events[offset[i]:offset[i + 1]] (the last one runs to the end),
+            # its timestamps are start_ts[i] / end_ts[i]. The datasets are created by the first write,
+            # the event dtype is not known before. HDF5 is not thread-safe, the writer threads take h5_lock
+            self.event_compression = event_compression()
+            self.h5 = h5py.File(self.event_dir / "events.h5", 'w', libver="latest",
+                                rdcc_nbytes=H5_CHUNK_CACHE_BYTES)
+            self.h5_lock = threading.Lock()
+            self.events_ds = None
+            self.h5_writes = 0
+            # the depth maps go losslessly compressed into frame/depth.h5 instead of one PNG each
+            self.depth_compression = depth_compression()
+            self.depth_h5 = h5py.File(self.frame_dir / "depth.h5", 'w', libver="latest",
+                                      rdcc_nbytes=H5_CHUNK_CACHE_BYTES)
+            # how the datasets are stored: 'blosc2' datasets hold pack_array bytes,
+            # 'hdf5' ones the depth map behind an HDF5 filter
+            self.depth_h5.attrs['format'] = 'blosc2' if blosc2 is not None else 'hdf5'
+            self.depth_writes = 0
+            # backpressure: a record holds a permit until its events, rgb and depth are all written,
+            # when the writers fall behind pairs are dropped here instead of queueing up behind them
+            self.record_sem = threading.BoundedSemaphore(RECORD_MAX_IN_FLIGHT)
+            self.record_drops = 0
+            # until one record went through, slow first writes (dataset creation, first encodes) are waited for
+            self.first_record_done = threading.Event()
+            print(f"[SensorSynchronizer] Record enabled. ProcessPoolExecutor started with {worker_count} encoder processes.")
 
     def sync_process(self):
         """
@@ -42,37 +238,48 @@ class SensorSynchronizer:
         :param self: member method
         """
         print("[SensorSynchronizer] Processor Loop Started. Waiting for sensor information to sync...")
-        while not self.stop_event.is_set():
-            has_data = False
-            try:
-                evs_data = self.slice_queue.get_nowait()
-                self.evs_buffer.append(evs_data)
-                has_data = True
-            except Empty:
-                pass
-
-            try:
-                orb_data = self.o_queue_sync.get_nowait()
-                self.orb_buffer.append(orb_data)
-                has_data = True
-            except Empty:
-                pass
-
-            if len(self.evs_buffer) > 0 and len(self.orb_buffer) > 0:
-                self.sync()
-
-            # buffer length monitoring module, for debugging
-            # check buffer status every 5 seconds
-            if time.time() - self.last_monitor_time > 5:
-                self.monitor_buffers()
-                self.last_monitor_time = time.time()
-
-            if not has_data:
-                time.sleep(0.001)
-        
-        if self.record_enabled:
-            print("[SensorSynchronizer] Waiting for remaining record tasks to complete...")
-            self.executor.shutdown(wait=True)
+        if self.cpu_split:
+            pin_to_cpus(self.cpu_split[0])
+            print(f"[SensorSynchronizer] Sync loop on CPUs {sorted(self.cpu_split[0])}, writers on {sorted(self.cpu_split[1])}.")
+        try:
+            while not self.stop_event.is_set():
+                # buffer length monitoring module, for debugging
+                # check buffer status every 5 seconds
+                now = time.monotonic_ns()
+                if now - self.last_monitor_time > MONITOR_INTERVAL_NS:
+                    self.monitor_buffers()
+                    self.last_monitor_time = now
+
+                # one blocking get wakes up on whichever input arrives first
+                try:
+                    tag, msg = self.sync_queue.get(timeout=SYNC_WAIT_S)
+                except Empty:
+                    tag = None
+
+                if tag == 'evs':
+                    if self.evs_buffer.full():
+                        # explicit overflow instead of deque's silent drop: the oldest slice gives way
+                        self.evs_buffer.popleft()
+                        print("[WARNING!!!] [SensorSynchronizer] Event slice buffer is full. Dropping the oldest slice.")
+                    self.evs_buffer.append(msg)
+                elif tag == 'orb':
+                    slot, frames, meta = self.o_ring_sync.open(msg)
+                    # no copy, the frames are views into the slot, which is held until drop_orb() or the writer releases it
+                    self.push_orb({'slot': slot, 'rgb': frames['rgb'], 'depth': frames['depth'], **meta})
+
+                if len(self.evs_buffer) > 0 and len(self.orb_buffer) > 0:
+                    self.sync()
+        finally:
+            # also when the loop dies on an exception: the rings outlive this process,
+            # the next session must start with every sync slot free, and the files must be closed
+            self.release_orb_frames()
+            if self.record_enabled:
+                print("[SensorSynchronizer] Waiting for remaining record tasks to complete...")
+                self.event_writer.shutdown(wait=True)
+                self.executor.shutdown(wait=True)
+                self.encode_pool.shutdown(wait=True)
+                self.h5.close()
+                self.depth_h5.close()
         print("[SensorSynchronizer] Processor Loop Stopped. Sync Stopped.")
 
     def monitor_buffers(self):
@@ -83,10 +290,10 @@ class SensorSynchronizer:
         if self.initial_delta_monitoring is not None and self.delta_orb_to_evs is not None:
             drift_amount = self.delta_orb_to_evs - self.initial_delta_monitoring
 
-        if self.diff_samples:
-            avg_diff = sum(self.diff_samples) / len(self.diff_samples)
-            max_diff = max(self.diff_samples)
-            self.diff_samples.clear()
+        if self.diff_count:
+            avg_diff = self.diff_sum / self.diff_count
+            max_diff = self.diff_max
+            self.diff_sum = self.diff_max = self.diff_count = 0
         else:
             avg_diff = 0
             max_diff = 0
@@ -95,7 +302,7 @@ class SensorSynchronizer:
               f"Drift:{drift_amount:6d}us | "
               f"AvgDiff:{avg_diff:5.0f}us | MaxDiff:{max_diff:5.0f}us")
         
-        if e_len >= 90 or o_len >= 90:
+        if e_len >= self.evs_buffer.capacity * 9 // 10 or o_len >= self.orb_buffer.capacity - 1:
             print(f"!!! [CRITICAL] Buffer almost full! Check if sync logic is too slow.")
 
     def sync(self):   
@@ -115,24 +322,24 @@ class SensorSynchronizer:
             print(f"[SensorSynchronizer] Delta between ORBBEC and Events: {self.delta_orb_to_evs} us")
         
         # put orb frames onto event timeline
-        best_match_idx = None
-        min_diff = float('inf')
-
-        for i, orb in enumerate(self.orb_buffer):
-            # change orb timestamp onto event timeline
-            mapped_orb_ts = orb['rgb_ts'] + self.delta_orb_to_evs
-            diff = abs(mapped_orb_ts - evs_ts)
-
-            if diff < min_diff:
-                min_diff = diff
-                best_match_idx = i
+        if self._orb_ts_arr is None:
+            self._orb_ts_arr = np.fromiter(self.orb_ts, dtype=np.int64, count=len(self.orb_ts))
+        # change orb timestamps onto event timeline, they are increasing,
+        # so the nearest frame is one of the two around the insertion point (argmin keeps the older one on ties)
+        mapped_orb_ts = self._orb_ts_arr + self.delta_orb_to_evs
+        i = np.searchsorted(mapped_orb_ts, evs_ts)
+        candidates = np.clip((i - 1, i), 0, len(mapped_orb_ts) - 1)
+        diffs = np.abs(mapped_orb_ts[candidates] - evs_ts)
+        k = diffs.argmin()
+        best_match_idx = int(candidates[k])
+        min_diff = int(diffs[k])
         
-        if best_match_idx != None and min_diff < self.sync_threshold_us:
+        if min_diff < self.sync_threshold_us:
             # successfully matched
             matched_evs = self.evs_buffer.popleft() # pop out the matched event slice
             for _ in range(best_match_idx): # pop out the outdated ORBBEC frames
-                self.orb_buffer.popleft()
-            matched_orb = self.orb_buffer.popleft()
+                self.drop_orb()
+            matched_orb = self.pop_orb()
 
             # finetuning delta.
             # Useful, two devices has different timestamp rate, even they are all us timestamp,
@@ -141,11 +348,16 @@ class SensorSynchronizer:
             current_error = evs_ts - (matched_orb['rgb_ts'] + self.delta_orb_to_evs)
             self.delta_orb_to_evs += int(current_error * self.drift_alpha)
 
-            self.diff_samples.append(min_diff)
+            self.diff_sum += min_diff
+            self.diff_count += 1
+            if min_diff > self.diff_max:
+                self.diff_max = min_diff
             # DEBUG INFO
             # self.output_sync_info(matched_evs, matched_orb, min_diff)
             if self.record_enabled:
                 self.record(matched_evs, matched_orb)
+            else:
+                self.o_ring_sync.release(matched_orb['slot'])
         else:
             # if the oldest evs is older than all mapped_orb in buffer, and out of the threshold
             # thus this evs frame can not be matched with proper ORBBEC frame
@@ -155,11 +367,42 @@ class SensorSynchronizer:
             if evs_ts < mapped_oldest_orb_ts - self.sync_threshold_us:
                 self.evs_buffer.popleft()
             elif evs_ts > mapped_newest_orb_ts + self.sync_threshold_us:
-                self.orb_buffer.popleft()
+                self.drop_orb()
                 # effective?? Determine whether this condition will be encountered.
                 # Answer: Normally this condition will not be encountered. when ORB frames are all too old, scatter them.
                 print(f"[SensorSynchronizer] ORB Frame Dropped. ")
 
+    def push_orb(self, orb_data):
+        if self.orb_buffer.full():
+            # no event slices to match against, keep the newest frames like deque(maxlen=...) did
+            self.drop_orb()
+        self.orb_buffer.append(orb_data)
+        self.orb_ts.append(orb_data['rgb_ts'])
+        self._orb_ts_arr = None
+
+    def pop_orb(self):
+        self.orb_ts.popleft()
+        self._orb_ts_arr = None
+        return self.orb_buffer.popleft()
+
+    def drop_orb(self):
+        self.o_ring_sync.release(self.pop_orb()['slot'])
+
+    def release_orb_frames(self):
+        """
+        hand every sync ring slot this session still holds back to the ring: the buffered frames
+        and the frames still queued, which would otherwise show up as stale frames in the next session.
+        """
+        while self.orb_buffer:
+            self.drop_orb()
+        while True:
+            try:
+                tag, msg = self.sync_queue.get_nowait()
+            except Empty:
+                break
+            if tag == 'orb':
+                self.o_ring_sync.release(msg['slot'])
+
     def output_sync_info(self, evs_data, orb_data, diff):
         mapped_orb_ts = orb_data['rgb_ts'] + self.delta_orb_to_evs
 
@@ -208,40 +451,103 @@ class SensorSynchronizer:
     #     self.record_idx += 1
 
     def record(self, matched_evs, matched_orb):
-        # deep copy in main thread
-        rgb_img = matched_orb['rgb'].copy() if 'rgb' in matched_orb else None
-        depth_img = matched_orb['depth'].copy() if 'depth' in matched_orb else None
-
+        slot = matched_orb['slot']
+        timeout = RECORD_ACQUIRE_TIMEOUT_S if self.first_record_done.is_set() else None
+        if not self.record_sem.acquire(timeout=timeout):
+            self.o_ring_sync.release(slot)
+            self.record_drops += 1
+            print(f"[WARNING!!!] [SensorSynchronizer] Writers are behind. Dropping matched pair ({self.record_drops} so far).")
+            return
+
+        idx_str = f"{self.record_idx:06d}"
         data_bundle = {
             'idx': self.record_idx,
-            'rgb': rgb_img,
-            'depth': depth_img,
             'event_volume': matched_evs['event_volume'],
             'start_ts': matched_evs['start_ts'],
             'end_ts': matched_evs['end_ts']
         }
-
-        self.executor.submit(self._async_write_task, data_bundle)
+        futures = []
+        try:
+            futures.append(self.event_writer.submit(self._async_write_task, data_bundle))
+
+            # no copy in the main thread: the encoder process attaches to the sync ring slot by name and
+            # the depth writer thread reads the slot view, the slot is released once both are done
+            rgb = matched_orb['rgb']
+            if rgb is not None:
+                rgb_spec = (self.o_ring_sync.shms['rgb'][slot].name, rgb.shape, rgb.dtype.str)
+                futures.append(self.encode_pool.submit(encode_rgb_task, self.frame_dir_str, idx_str,
+                                                       rgb_spec, matched_orb.get('is_rgb', False)))
+            if matched_orb['depth'] is not None:
+                futures.append(self.executor.submit(self._write_depth_task, idx_str, matched_orb['depth']))
+        except Exception:
+            # e.g. BrokenProcessPool after an encoder died: the slot and the permit go back
+            # (after the parts already submitted), then the error ends the sync loop
+            self.release_when_done(slot, futures)
+            raise
+        self.release_when_done(slot, futures)
         self.record_idx += 1
 
+    def release_when_done(self, slot, futures):
+        # the slot and the record permit go back once every part of the record (events, rgb, depth) is written
+        if not futures:
+            self.o_ring_sync.release(slot)
+            self.record_sem.release()
+            return
+        remaining = [len(futures)]
+        lock = threading.Lock()
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.o_ring_sync.release(slot)
+                self.record_sem.release()
+                self.first_record_done.set()
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def _write_depth_task(self, idx_str, depth):
+        # writer thread, depth map straight from the sync ring slot
+        try:
+            packed = pack_array(depth, codec='ZSTD', clevel=3) if blosc2 is not None else None
+            with self.h5_lock:
+                if packed is not None:
+                    dset = self.depth_h5.create_dataset(idx_str, data=packed)
+                    dset.attrs['format'] = 'blosc2'
+                else:
+                    chunks = tuple(min(c, n) for c, n in zip(DEPTH_CHUNKS, depth.shape))
+                    dset = self.depth_h5.create_dataset(idx_str, data=depth, chunks=chunks, **self.depth_compression)
+                    dset.attrs['format'] = 'hdf5'
+                self.depth_writes += 1
+                if self.depth_writes % H5_FLUSH_EVERY == 0:
+                    self.depth_h5.flush()
+        except Exception as e:
+            print(f"[ASYNC RECORD ERROR] Depth task {idx_str} failed: {e}")
+
+    def _create_event_datasets(self, events):
+        self.events_ds = self.h5.create_dataset('events', shape=(0,), maxshape=(None,), dtype=events.dtype,
+                                                chunks=(EVENT_CHUNK_LEN,), **self.event_compression)
+        self.index_ds = [self.h5.create_dataset(name, shape=(0,), maxshape=(None,), dtype=np.int64,
+                                                chunks=(INDEX_ROWS_PER_CHUNK,))
+                         for name in ('offset', 'start_ts', 'end_ts')]
+
     def _async_write_task(self, bundle):
-        # writer thread
-        idx_str = f"{bundle['idx']:06d}"
-        event_dir = self.output_directory / "event"
-        frame_dir = self.output_directory / "frame"
+        # event writer thread, the only one, so the slices are appended in record order
+        idx = bundle['idx']
 
         try:
-            event_filename = event_dir / f"{idx_str}.h5"
-            with h5py.File(event_filename, 'w') as h5f:
-                h5f.create_dataset('events', data=bundle['event_volume'], compression="gzip", compression_opts=4)
-                h5f.attrs['start_ts'] = bundle['start_ts']
-                h5f.attrs['end_ts'] = bundle['end_ts']
-
-            if bundle['rgb'] is not None:
-                cv2.imwrite(str(frame_dir / f"{idx_str}_rgb.jpg"), bundle['rgb'], [int(cv2.IMWRITE_JPEG_QUALITY), 95])
-            
-            if bundle['depth'] is not None:
-                cv2.imwrite(str(frame_dir / f"{idx_str}_depth.png"), bundle['depth'])
-
+            events = bundle['event_volume']
+            with self.h5_lock:
+                if self.events_ds is None:
+                    self._create_event_datasets(events)
+                offset = self.events_ds.shape[0]
+                self.events_ds.resize((offset + len(events),))
+                self.events_ds[offset:] = events
+                for ds, value in zip(self.index_ds, (offset, bundle['start_ts'], bundle['end_ts'])):
+                    ds.resize((idx + 1,))
+                    ds[idx] = value
+                self.h5_writes += 1
+                if self.h5_writes % H5_FLUSH_EVERY == 0:
+                    self.h5.flush()
         except Exception as e:
-            print(f"[ASYNC RECORD ERROR] Task {idx_str} failed: {e}")
\ No newline at end of file
+            print(f"[ASYNC RECORD ERROR] Task {idx:06d} failed: {e}")
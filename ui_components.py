@@ -1,9 +1,13 @@
 import cv2
+import time
 import numpy as np
 from PyQt5.QtWidgets import QLabel
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QImage, QPixmap, QFont
 
+MAX_PREVIEW_FPS = 60 # display refresh rate, faster bursts only replace the pending frame
+MIN_DRAW_INTERVAL_NS = 1_000_000_000 // MAX_PREVIEW_FPS
+
 class ImageDisplayWidget(QLabel):
     def __init__(self, title):
         super().__init__()
@@ -21,21 +25,68 @@ class ImageDisplayWidget(QLabel):
         """)
         self.setMinimumSize(800, 600)
 
-    def update_frame(self, frame):
+        # newest raw frame not drawn yet, (frame, is_rgb), it lives in _pending_buf, which is reused
+        self._pending = None
+        self._pending_buf = None
+        self._last_draw = 0 # time.monotonic_ns() of the last draw
+        self._render_scheduled = False
+
+    def update_frame(self, frame, is_rgb=False):
+        """
+        show a frame, drawing is throttled to MAX_PREVIEW_FPS with a drop-oldest policy.
+        frames inside the interval only replace the pending raw frame, resizing and conversion run once per
+        drawn frame in _render. The frame may be a shared memory view that is released right after this call,
+        so a deferred frame is copied (a plain memcpy into a reused buffer).
+        """
         if frame is None: return
+        wait_ns = MIN_DRAW_INTERVAL_NS - (time.monotonic_ns() - self._last_draw)
+        if wait_ns <= 0:
+            # draw straight from the caller's frame, an older pending one is obsolete
+            self._pending = None
+            self._render(frame, is_rgb)
+            return
+
+        buf = self._pending_buf
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._pending_buf = np.empty(frame.shape, dtype=frame.dtype)
+        np.copyto(buf, frame)
+        self._pending = (buf, is_rgb)
+        if not self._render_scheduled:
+            self._render_scheduled = True
+            QTimer.singleShot(wait_ns // 1_000_000 + 1, self._render_pending)
+
+    def _render_pending(self):
+        self._render_scheduled = False
+        if self._pending is None:
+            return
+        frame, is_rgb = self._pending
+        self._pending = None
         try:
-            h, w = frame.shape[:2]
-            if len(frame.shape) == 2: # Depth/Grayscale
-                # Normalize depth for visualization if it's uint16
-                if frame.dtype == np.uint16:
-                    frame = cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-                q_img = QImage(frame.data, w, h, w, QImage.Format_Grayscale8)
-            else: # BGR (from SDK) to RGB
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                q_img = QImage(rgb_frame.data, w, h, 3 * w, QImage.Format_RGB888)
-            
-            self.setText("")
-            self.setPixmap(QPixmap.fromImage(q_img).scaled(
-                self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        except Exception:
-            pass
\ No newline at end of file
+            self._render(frame, is_rgb)
+        except Exception as e:
+            # timer callback, an exception escaping it would abort the GUI
+            print(f"[UI] Skipping {self.title} frame: {e}")
+
+    def _render(self, frame, is_rgb):
+        h, w = frame.shape[:2]
+        # fit the frame into the label with cv2.resize before it becomes a QImage,
+        # Qt then only wraps it instead of running a smooth scale over the full-size frame
+        scale = min(self.width() / w, self.height() / h)
+        tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+        if (tw, th) != (w, h):
+            frame = cv2.resize(frame, (tw, th), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        if len(frame.shape) == 2 and frame.dtype == np.uint16:
+            # Normalize depth for visualization if it's uint16
+            frame = cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        frame = np.ascontiguousarray(frame)
+        h, w = frame.shape[:2]
+        if len(frame.shape) == 2: # Depth/Grayscale
+            q_img = QImage(frame.data, w, h, w, QImage.Format_Grayscale8)
+        else:
+            # Qt reads both byte orders directly (Format_BGR888 needs Qt >= 5.14), no swap pass
+            q_img = QImage(frame.data, w, h, 3 * w, QImage.Format_RGB888 if is_rgb else QImage.Format_BGR888)
+        
+        self.setText("")
+        # fromImage copies the pixels, so frame may be a shared memory view or the reused pending buffer
+        self.setPixmap(QPixmap.fromImage(q_img))
+        self._last_draw = time.monotonic_ns()